@@ -1,7 +1,10 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+import asyncio
+from typing import Any, Dict, List, Tuple
+import numpy as np
 from config import POCConfig
 from agents.openai_client import OpenAIJSONClient
+from agents.schemas import CriticVerdict
 
 
 class CriticAgent:
@@ -19,6 +22,10 @@ class CriticAgent:
             model="gpt-4o-mini",
             temperature=0.2,
             verbose=bool(cfg.verbose_openai),
+            cache_enabled=bool(cfg.cache_enabled),
+            semantic_cache_enabled=bool(cfg.semantic_cache_enabled),
+            cache_embedding_model=cfg.embedding_model_id,
+            cache_similarity_threshold=float(cfg.cache_similarity_threshold),
         )
         self.verbose = bool(cfg.verbose)
 
@@ -26,41 +33,46 @@ class CriticAgent:
         if self.verbose:
             print(f"[CriticAgent] {msg}")
 
-    def _genre_diversity(self, recs: List[Dict[str, Any]], topn: int) -> int:
-        genres = set()
-        for r in recs[:topn]:
-            g = (r.get("genres") or "")
-            for token in g.split("|"):
-                t = token.strip()
-                if t:
-                    genres.add(t)
-        return len(genres)
-
-    def _mean_popularity(self, recs: List[Dict[str, Any]], topn: int) -> float:
-        vals = []
-        for r in recs[:topn]:
-            pop = ((r.get("signals") or {}).get("baseline_popularity"))
-            if isinstance(pop, (int, float)):
-                vals.append(float(pop))
-        return float(sum(vals) / max(len(vals), 1))
-
-    def run(
+    @staticmethod
+    def _genre_diversity(genre_tokens: List[str]) -> int:
+        return len({t for t in genre_tokens if t})
+
+    @staticmethod
+    def _mean_popularity(pops: np.ndarray) -> float:
+        if not np.any(~np.isnan(pops)):
+            return 0.0
+        return float(np.nanmean(pops))
+
+    def _guardrails(
         self,
-        intent: str,
         context: Dict[str, Any],
         recs: List[Dict[str, Any]],
-    ) -> Dict[str, Any]:
-
-        intent = (intent or "explore").strip().lower()
+    ) -> Tuple[bool, Dict[str, Any], List[str]]:
         topn = int(self.cfg.critic_topn)
 
         needs_rerank = False
         adjustments: Dict[str, Any] = {}
         trace: List[str] = []
 
+        # Struct-of-arrays view of the top-N, built in one pass over the dicts
+        top = recs[:topn]
+        genre_tokens: List[str] = [
+            t.strip()
+            for g in (r.get("genres", "") for r in top)
+            if isinstance(g, str)
+            for t in g.split("|")
+        ]
+        pops = np.array(
+            [
+                p if isinstance(p := (r.get("signals") or {}).get("baseline_popularity"), (int, float)) else np.nan
+                for r in top
+            ],
+            dtype=np.float32,
+        )
+
         # 1) DETERMINISTIC GUARDRAILS 
 
-        mean_pop = self._mean_popularity(recs, topn)
+        mean_pop = self._mean_popularity(pops)
         if mean_pop > float(self.cfg.popularity_mean_threshold):
             needs_rerank = True
             adjustments["novelty_lambda"] = min(
@@ -68,7 +80,7 @@ class CriticAgent:
             )
             trace.append(f"Top-{topn} mean popularity too high: {mean_pop:.2f}")
 
-        gdiv = self._genre_diversity(recs, topn)
+        gdiv = self._genre_diversity(genre_tokens)
         if gdiv < int(self.cfg.genre_diversity_min_unique):
             needs_rerank = True
             adjustments["diversity_boost"] = 0.10
@@ -78,15 +90,9 @@ class CriticAgent:
         # 2) HARD MATURITY / SUITABILITY VETO  (OPTION B)
         # ======================================================
 
-        genres: List[str] = []
-        for r in recs[:topn]:
-            g = r.get("genres", "")
-            if isinstance(g, str):
-                genres.extend([x.strip() for x in g.split("|")])
-
         children_ratio = (
-            sum(1 for g in genres if g.lower() == "children")
-            / max(1, len(genres))
+            sum(1 for g in genre_tokens if g.lower() == "children")
+            / max(1, len(genre_tokens))
         )
 
         user_query = (context.get("query") or "").lower()
@@ -100,8 +106,45 @@ class CriticAgent:
             adjustments["exclude_genres"] = ["Children"]
             trace.append("hard_veto_children_content")
 
-        # 3) LLM CRITIQUE 
+        return needs_rerank, adjustments, trace
+
+    def _can_shortcircuit(self, needs_rerank: bool, adjustments: Dict[str, Any]) -> bool:
+        """
+        Guardrails already forced a rerank with enough adjustments that the
+        LLM critique adds little; skip it.
+
+        Rerank only acts on weight deltas, which the short-circuit supplies
+        via _shortcircuit_adjustments() when prefer_weight_adjustments is set;
+        without them the LLM critique is still needed.
+        """
+        return (
+            bool(self.cfg.critic_shortcircuit)
+            and bool(self.cfg.prefer_weight_adjustments)
+            and needs_rerank
+            and len(adjustments) >= int(self.cfg.critic_shortcircuit_min_adjustments)
+        )
 
+    def would_shortcircuit(self, context: Dict[str, Any], recs: List[Dict[str, Any]]) -> bool:
+        """
+        True when run() will return a deterministic rerank without the LLM.
+        """
+        needs_rerank, adjustments, _ = self._guardrails(context, recs)
+        return self._can_shortcircuit(needs_rerank, adjustments)
+
+    def _shortcircuit_adjustments(self, adjustments: Dict[str, Any]) -> Dict[str, Any]:
+        # Popularity / diversity / suitability flags: shift weight from CF (the
+        # popularity-driven signal) towards the semantic intent. rerank_node
+        # still clamps CF to the planner's hybrid bounds.
+        adjustments.setdefault("weight_cf_delta", float(self.cfg.critic_shortcircuit_cf_delta))
+        adjustments.setdefault("weight_semantic_delta", float(self.cfg.critic_shortcircuit_semantic_delta))
+        return adjustments
+
+    @staticmethod
+    def _prompts(
+        intent: str,
+        context: Dict[str, Any],
+        recs: List[Dict[str, Any]],
+    ) -> Tuple[str, str]:
         system_prompt = (
             "You are a recommendation critic for a movie recommender.\n"
             "Return ONLY valid JSON.\n"
@@ -112,35 +155,21 @@ class CriticAgent:
         user_prompt = (
             f"Intent: {intent}\n"
             f"User context: {context}\n\n"
-            "You will be given the top recommendations with optional signals.\n"
-            "Assess:\n"
-            "- Does the list satisfy the query and constraints?\n"
-            "- Is novelty too low (too popular)?\n"
-            "- Is the list too narrow in genres?\n"
-            "- Are advantage signals reflected in top-ranked items?\n\n"
-            "Return JSON with exactly these keys:\n"
-            "{\n"
-            '  "needs_rerank": boolean,\n'
-            '  "adjustments": object,\n'
-            '  "trace": array of strings\n'
-            "}\n\n"
+            "Check: query/constraint fit, novelty (too popular?), genre breadth, "
+            "advantage signals reflected in top ranks.\n"
+            'Return JSON {"needs_rerank": boolean, "adjustments": object, "trace": [string]}\n\n'
             f"Top recommendations:\n{recs[:10]}\n"
         )
 
-        schema_hint = {
-            "needs_rerank": needs_rerank,
-            "adjustments": adjustments,
-            "trace": trace,
-        }
-
-        res = self.client.generate_json(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            force_json=True,
-            schema_hint=schema_hint,
-            max_retries=1,
-        )
+        return system_prompt, user_prompt
 
+    @staticmethod
+    def _merge(
+        needs_rerank: bool,
+        adjustments: Dict[str, Any],
+        trace: List[str],
+        res: Dict[str, Any],
+    ) -> Dict[str, Any]:
         data = res.get("data") or {}
         llm_needs = bool(data.get("needs_rerank", False))
         llm_adj = data.get("adjustments", {})
@@ -150,7 +179,8 @@ class CriticAgent:
 
         needs_rerank = bool(needs_rerank or llm_needs)
         if isinstance(llm_adj, dict):
-            adjustments.update(llm_adj)
+            # Strict schema returns every adjustment key; null means "no change"
+            adjustments.update({k: v for k, v in llm_adj.items() if v is not None})
 
         if isinstance(llm_trace, list):
             trace.extend(llm_trace)
@@ -158,13 +188,99 @@ class CriticAgent:
         trace.extend(res.get("trace", []))
         trace.append("openai_critic_v2")
 
-        out = {
+        return {
+            "needs_rerank": needs_rerank,
+            "adjustments": adjustments,
+            "trace": trace,
+        }
+
+    async def run(
+        self,
+        intent: str,
+        context: Dict[str, Any],
+        recs: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+
+        intent = (intent or "explore").strip().lower()
+        needs_rerank, adjustments, trace = self._guardrails(context, recs)
+
+        if self._can_shortcircuit(needs_rerank, adjustments):
+            adjustments = self._shortcircuit_adjustments(adjustments)
+            trace.append("deterministic_critic_shortcircuit")
+            self._log(f"Critic (deterministic): needs_rerank=True, adjustments={adjustments}")
+            return {"needs_rerank": True, "adjustments": adjustments, "trace": trace}
+
+        # 3) LLM CRITIQUE 
+
+        system_prompt, user_prompt = self._prompts(intent, context, recs)
+
+        schema_hint = {
             "needs_rerank": needs_rerank,
             "adjustments": adjustments,
             "trace": trace,
         }
 
+        res = await self.client.generate_json(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            force_json=True,
+            schema_hint=schema_hint,
+            max_retries=1,
+            prompt_cache_key="critic_v1",
+            schema=CriticVerdict,
+        )
+
+        out = self._merge(needs_rerank, adjustments, trace, res)
+
         self._log(
-            f"Critic: needs_rerank={needs_rerank}, adjustments={adjustments}"
+            f"Critic: needs_rerank={out['needs_rerank']}, adjustments={out['adjustments']}"
         )
         return out
+
+    async def run_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Critique many rec sets at once (offline evaluation).
+
+        Each item is {"intent": str, "context": dict, "recs": list}.
+        With cfg.use_batch_api_for_eval the LLM critiques are enqueued on the
+        OpenAI Batch API; otherwise they run concurrently via run().
+        """
+        if not self.cfg.use_batch_api_for_eval:
+            return list(await asyncio.gather(
+                *[self.run(it.get("intent"), it.get("context") or {}, it.get("recs") or []) for it in items]
+            ))
+
+        outs: List[Dict[str, Any]] = [{} for _ in items]
+        pending = []
+        requests = []
+        for i, it in enumerate(items):
+            intent = (it.get("intent") or "explore").strip().lower()
+            context = it.get("context") or {}
+            recs = it.get("recs") or []
+            needs_rerank, adjustments, trace = self._guardrails(context, recs)
+
+            if self._can_shortcircuit(needs_rerank, adjustments):
+                adjustments = self._shortcircuit_adjustments(adjustments)
+                trace.append("deterministic_critic_shortcircuit")
+                outs[i] = {"needs_rerank": True, "adjustments": adjustments, "trace": trace}
+                continue
+
+            pending.append((i, needs_rerank, adjustments, trace))
+            system_prompt, user_prompt = self._prompts(intent, context, recs)
+            requests.append({
+                "system_prompt": system_prompt,
+                "user_prompt": user_prompt,
+                "force_json": True,
+                "prompt_cache_key": "critic_v1",
+                "schema": CriticVerdict,
+            })
+
+        results = await self.client.generate_json_batch(
+            requests, poll_interval=float(self.cfg.batch_poll_interval_s)
+        )
+
+        for (i, *guard), res in zip(pending, results):
+            outs[i] = self._merge(*guard, res)
+
+        self._log(f"Critic batch: {sum(o['needs_rerank'] for o in outs)}/{len(outs)} need rerank")
+        return outs
@@ -1,7 +1,7 @@
-import json
 from typing import Any, Dict, List, Optional
 
-from agents.openai_client import OpenAIJSONClient
+from agents.openai_client import OpenAIJSONClient, dumps_json
+from agents.schemas import Explanation
 
 
 class ExplainerAgent:
@@ -16,10 +16,10 @@ class ExplainerAgent:
     - No algorithm, model, or scoring language
     """
 
-    def __init__(self, model: str = "gpt-4o-mini"):
-        self.llm = OpenAIJSONClient(model=model, temperature=0.55)
+    def __init__(self, model: str = "gpt-4o-mini", cache_enabled: bool = False):
+        self.llm = OpenAIJSONClient(model=model, temperature=0.55, cache_enabled=cache_enabled)
 
-    def run(
+    async def run(
         self,
         intent: str,
         strategy: Dict[str, Any],
@@ -29,30 +29,13 @@ class ExplainerAgent:
         context = context or {}
 
         system_prompt = """
-You are the Netflix Explainer.
-
-Your job is to explain WHY these recommendations fit the user's request —
-without exaggeration and without forcing relevance.
-
-CORE PRINCIPLES:
-- Be honest about fit quality. Not every recommendation is a perfect match.
-- Emphasize the strongest matches first.
-- If a title is only a partial or tonal match, say so gently.
-- Never invent plot details or specific scenes.
-
-RULES:
-- Speak directly TO the user ("you"), never AS the user.
-- Do NOT mention algorithms, models, embeddings, rankings, or scores.
-- Do NOT claim deep romance, realism, or emotional depth unless the title clearly supports it.
-- Use careful language when appropriate:
-  "leans more toward", "has elements of", "is less about romance but shares a grounded tone".
-- Explicitly reference the user's constraints (e.g., "feels real", "not cheesy", "grounded", "emotionally honest").
-- Avoid generic genre-only explanations.
-- Output ONLY valid JSON (no markdown, no commentary).
-
-TONE:
-- Calm, editorial, and human.
-- Similar to Netflix's in-app editorial blurbs.
+You explain movie picks to the user.
+- Honest fit: strongest matches first; call partial or tonal matches what they are.
+- Reference the user's stated constraints (e.g. "feels real", "not cheesy").
+- Speak to the user ("you"); calm, editorial tone.
+- Titles and genres only: no invented plot, scenes, or facts.
+- Never mention algorithms, models, embeddings, rankings, or scores.
+- JSON only.
 """
 
         # Keep explanation grounded: title + genres only
@@ -65,55 +48,27 @@ TONE:
         ]
 
         user_prompt = f"""
-User intent:
-{intent}
-
-User context (JSON):
-{json.dumps(context, indent=2)}
-
-Top recommendations (title + genres only):
-{json.dumps(top3, indent=2)}
-
-WRITE:
-- one_liner:
-  ONE sentence summarizing why these picks were chosen,
-  explicitly referencing the user's constraints.
-
-- bullets:
-  EXACTLY 3 bullets.
-  Each bullet must:
-  - Mention a specific title.
-  - Explain how it aligns with the user's constraints.
-  - Use honest framing (strong match vs partial/tonal match).
-  - Avoid plot claims or factual specifics.
-
-IMPORTANT:
-- If a movie is not clearly romantic or emotionally grounded,
-  describe it as a tonal or adjacent match rather than a direct one.
-- Do NOT try to justify poor matches.
-
-RETURN ONLY THIS JSON SCHEMA:
-{{
-  "one_liner": "string",
-  "bullets": ["string", "string", "string"]
-}}
+Intent: {intent}
+Context: {dumps_json(context)}
+Picks (title + genres): {dumps_json(top3)}
+
+Return JSON {{"one_liner": "string", "bullets": ["string", "string", "string"]}}
+- one_liner: one sentence on why these picks fit the user's constraints.
+- bullets: exactly 3, one per title, saying how it aligns (strong vs partial/tonal match).
+- Do not justify poor matches.
 """
 
-        schema_hint = {
-            "one_liner": "These films focus on grounded, emotionally honest storytelling rather than glossy or exaggerated romance.",
-            "bullets": [
-                "Get Real (1998) is often described as emotionally raw and understated, which aligns well with a preference for romance that feels genuine rather than performative.",
-                "All the Real Girls (2003) leans into quiet, character-driven moments, favoring emotional realism over dramatic spectacle.",
-                "Blue Valentine (2010) is known for its unvarnished tone, offering a more difficult but deeply authentic take on romantic relationships.",
-            ],
-        }
+        # Only used on the repair retry
+        schema_hint = {"one_liner": "string", "bullets": ["string", "string", "string"]}
 
-        resp = self.llm.generate_json(
+        resp = await self.llm.generate_json(
             system_prompt=system_prompt,
             user_prompt=user_prompt,
             force_json=True,
             schema_hint=schema_hint,
             max_retries=1,
+            prompt_cache_key="explainer_v1",
+            schema=Explanation,
         )
 
         data = resp["data"] if resp["ok"] else {}
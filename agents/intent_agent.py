@@ -1,7 +1,7 @@
-import json
 from typing import Any, Dict
 
-from agents.openai_client import OpenAIJSONClient
+from agents.openai_client import OpenAIJSONClient, dumps_json
+from agents.schemas import IntentResult
 
 
 class IntentAgent:
@@ -13,10 +13,22 @@ class IntentAgent:
     - Always returns JSON-safe primitives.
     """
 
-    def __init__(self, model: str = "gpt-4o-mini"):
-        self.llm = OpenAIJSONClient(model=model, temperature=0.2)
+    def __init__(self, model: str = "gpt-4o-mini", cache_enabled: bool = False):
+        self.llm = OpenAIJSONClient(model=model, temperature=0.2, cache_enabled=cache_enabled)
+
+    async def run(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        query = (context.get("query") or "").strip()
+
+        # A non-empty query always resolves to "search"; skip the LLM
+        if query:
+            return {
+                "intent": "search",
+                "confidence": 1.0,
+                "needs_clarification": False,
+                "clarification_question": "",
+                "trace": ["deterministic_intent_shortcircuit"],
+            }
 
-    def run(self, context: Dict[str, Any]) -> Dict[str, Any]:
         system_prompt = """
 You are an intent classification agent for a movie recommender.
 
@@ -33,7 +45,7 @@ Your job:
 
         user_prompt = f"""
 Context (JSON):
-{json.dumps(context, indent=2)}
+{dumps_json(context)}
 
 Allowed intents (choose exactly one):
 - "search": user has a concrete query phrase or specific attributes
@@ -68,7 +80,14 @@ Return ONLY this JSON schema:
             "trace": ["..."],
         }
 
-        resp = self.llm.generate_json(system_prompt, user_prompt, force_json=True, schema_hint=schema_hint, max_retries=1)
+        resp = await self.llm.generate_json(
+            system_prompt,
+            user_prompt,
+            force_json=True,
+            schema_hint=schema_hint,
+            max_retries=1,
+            schema=IntentResult,
+        )
 
         data = resp["data"] if resp["ok"] else {}
         trace = list(data.get("trace", [])) if isinstance(data.get("trace", []), list) else []
@@ -76,7 +95,6 @@ Return ONLY this JSON schema:
         trace.append("intent_agent_openai")
 
         # --- HARD GUARDS (deterministic enforcement) ---
-        query = (context.get("query") or "").strip()
         novelty = context.get("novelty_tolerance", None)
         minutes = context.get("available_minutes", None)
 
@@ -1,13 +1,58 @@
+import asyncio
 import json
-from typing import Any, Dict, Optional, Tuple
-from openai import OpenAI
+import os
+import tempfile
+import weakref
+from typing import Any, Dict, List, MutableMapping, Optional, Tuple, Type
+import numpy as np
+import orjson
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+from pydantic import BaseModel
+from agents.response_cache import SemanticResponseCache
+
+
+# One AsyncOpenAI (and its httpx connection pool) per event loop, shared by
+# every OpenAIJSONClient. Pooled connections are bound to the loop that
+# opened them, so separate asyncio.run() calls each get their own.
+_SHARED_CLIENTS: MutableMapping[asyncio.AbstractEventLoop, AsyncOpenAI] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_shared_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    client = _SHARED_CLIENTS.get(loop)
+    if client is None:
+        client = AsyncOpenAI()
+        _SHARED_CLIENTS[loop] = client
+    return client
+
+
+def dumps_json(obj: Any) -> str:
+    """
+    Compact JSON for prompt payloads (no indentation whitespace: fewer
+    tokens, same meaning to the model). Uses orjson, falling back to the
+    stdlib for payloads orjson rejects.
+    """
+    try:
+        return orjson.dumps(obj).decode()
+    except TypeError:
+        return json.dumps(obj, separators=(",", ":"))
 
 
 class OpenAIJSONClient:
     """
-    OpenAI helper with:
-    - JSON-only enforcement
-    - bounded repair
+    Async OpenAI helper with:
+    - JSON-only enforcement (strict JSON schema when a model is given)
+    - bounded repair (skipped in strict schema mode)
+    - per-call timeout + exponential backoff on transient API errors
+    - optional exact response cache, with an opt-in semantic tier
     - structured verbosity (NO chain-of-thought)
     """
 
@@ -17,35 +62,149 @@ class OpenAIJSONClient:
         temperature: float = 0.2,
         timeout: Optional[float] = None,
         verbose: bool = False,
+        cache_enabled: bool = False,
+        semantic_cache_enabled: bool = False,
+        cache_embedding_model: str = "text-embedding-3-small",
+        cache_similarity_threshold: float = 0.95,
+        max_transient_retries: int = 3,
     ):
-        self.client = OpenAI()
         self.model = model
         self.temperature = temperature
         self.timeout = timeout
         self.verbose = verbose
+        self.max_transient_retries = max_transient_retries
+        self.cache_embedding_model = cache_embedding_model
+        self.semantic_cache_enabled = semantic_cache_enabled
+        self.cache: Optional[SemanticResponseCache] = None
+        if cache_enabled:
+            self.cache = SemanticResponseCache(threshold=cache_similarity_threshold)
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        return _get_shared_client()
 
     def _log(self, msg: str):
         if self.verbose:
             print(f"[OpenAIJSONClient] {msg}")
 
-    def _call(self, system_prompt: str, user_prompt: str, force_json: bool = True) -> str:
-        self._log("Calling OpenAI API")
+    async def _with_backoff(self, create, **kwargs):
+        """
+        create(**kwargs) with the per-call timeout and exponential backoff on
+        transient API errors. Callers pass a client with SDK-level retries
+        disabled, so this loop is the only (bounded) one.
+        """
+        for attempt in range(self.max_transient_retries + 1):
+            try:
+                return await create(**kwargs, timeout=self.timeout or 30.0)
+            except (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError) as e:
+                if attempt == self.max_transient_retries:
+                    raise
+                delay = 2 ** attempt
+                self._log(f"Transient OpenAI error ({type(e).__name__}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        # Semantic cache tier is best-effort; the exact tier still works without it
+        try:
+            client = self.client.with_options(max_retries=0)
+            r = await self._with_backoff(
+                client.embeddings.create, model=self.cache_embedding_model, input=[text]
+            )
+        except Exception as e:
+            self._log(f"Cache embedding failed: {e}")
+            return None
+        return SemanticResponseCache.normalize(r.data[0].embedding)
+
+    async def _call(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        force_json: bool = True,
+        prompt_cache_key: Optional[str] = None,
+        schema: Optional[Type[BaseModel]] = None,
+    ) -> str:
+        if self.cache is None:
+            return await self._call_api(system_prompt, user_prompt, force_json, prompt_cache_key, schema)
 
-        kwargs: Dict[str, Any] = {}
-        if force_json:
-            kwargs["response_format"] = {"type": "json_object"}
+        # Same prompts under a different response format / cache route are different requests
+        schema_name = schema.__name__ if schema is not None else ""
+        variant = f"{schema_name}|{prompt_cache_key or ''}|{int(force_json)}"
+        key = self.cache.exact_key(
+            system_prompt, user_prompt, self.model, self.temperature, variant
+        )
+        raw = self.cache.get_exact(key)
+        if raw is not None:
+            self._log("Exact cache hit")
+            return raw
 
-        resp = self.client.chat.completions.create(
-            model=self.model,
-            temperature=self.temperature,
-            messages=[
+        namespace = self.cache.namespace(system_prompt, self.model, self.temperature, variant)
+        embedding = None
+        if self.semantic_cache_enabled:
+            embedding = await self._embed(user_prompt)
+            raw = self.cache.get_semantic(namespace, embedding)
+            if raw is not None:
+                self._log("Semantic cache hit")
+                return raw
+
+        raw = await self._call_api(system_prompt, user_prompt, force_json, prompt_cache_key, schema)
+
+        # Only cache responses that parse; broken JSON goes through repair instead
+        if self._try_parse(raw)[1]:
+            self.cache.put(key, namespace, raw, embedding)
+        return raw
+
+    def _chat_body(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        force_json: bool = True,
+        prompt_cache_key: Optional[str] = None,
+        schema: Optional[Type[BaseModel]] = None,
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": [
                 {"role": "system", "content": system_prompt.strip()},
                 {"role": "user", "content": user_prompt.strip()},
             ],
-            **kwargs,
-        )
+        }
+        if schema is not None:
+            # Server-side constrained decoding: output always matches the schema
+            body["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": schema.__name__,
+                    "schema": schema.model_json_schema(),
+                    "strict": True,
+                },
+            }
+        elif force_json:
+            body["response_format"] = {"type": "json_object"}
+        if prompt_cache_key:
+            # Routes requests sharing a static prefix to the same prompt cache
+            body["prompt_cache_key"] = prompt_cache_key
+        return body
 
-        raw = resp.choices[0].message.content.strip()
+    async def _call_api(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        force_json: bool = True,
+        prompt_cache_key: Optional[str] = None,
+        schema: Optional[Type[BaseModel]] = None,
+    ) -> str:
+        self._log("Calling OpenAI API")
+
+        body = self._chat_body(system_prompt, user_prompt, force_json, prompt_cache_key, schema)
+        if "prompt_cache_key" in body:
+            body["extra_body"] = {"prompt_cache_key": body.pop("prompt_cache_key")}
+
+        client = self.client.with_options(max_retries=0)
+        resp = await self._with_backoff(client.chat.completions.create, **body)
+
+        # content is None when the model refuses under a strict schema
+        raw = (resp.choices[0].message.content or "").strip()
         self._log(f"Raw response length: {len(raw)} chars")
         return raw
 
@@ -55,26 +214,32 @@ class OpenAIJSONClient:
             return None, False
 
         try:
-            return json.loads(raw), True
+            return orjson.loads(raw), True
         except Exception:
             start = raw.find("{")
             end = raw.rfind("}")
             if start != -1 and end != -1 and end > start:
                 try:
-                    return json.loads(raw[start:end + 1]), True
+                    return orjson.loads(raw[start:end + 1]), True
                 except Exception:
                     return None, False
         return None, False
 
-    def generate_json(
+    async def generate_json(
         self,
         system_prompt: str,
         user_prompt: str,
         force_json: bool = True,
         schema_hint: Optional[Dict[str, Any]] = None,
         max_retries: int = 1,
+        prompt_cache_key: Optional[str] = None,
+        schema: Optional[Type[BaseModel]] = None,
     ) -> Dict[str, Any]:
         """
+        schema_hint is only sent on the repair retry, never on the first call.
+        With a pydantic `schema`, the response is constrained server-side
+        (strict JSON schema) and the repair retry is skipped.
+
         Returns:
         {
             "ok": bool,
@@ -89,7 +254,7 @@ class OpenAIJSONClient:
 
         # Attempt 1
         try:
-            raw = self._call(system_prompt, user_prompt, force_json)
+            raw = await self._call(system_prompt, user_prompt, force_json, prompt_cache_key, schema)
             obj, ok = self._try_parse(raw)
             if ok and isinstance(obj, dict):
                 self._log("JSON parsed successfully")
@@ -100,7 +265,10 @@ class OpenAIJSONClient:
             trace.append(f"openai_call_failed:{type(e).__name__}")
             self._log(f"OpenAI call failed: {e}")
 
-        # Repair attempt
+        # Repair attempt (a strict schema failure is a refusal / API error, not bad JSON)
+        if schema is not None:
+            max_retries = 0
+
         for _ in range(max_retries):
             repair_system = (
                 "You repair invalid JSON.\n"
@@ -115,13 +283,13 @@ class OpenAIJSONClient:
             )
 
             if schema_hint:
-                repair_user += f"\nJSON schema hint:\n{json.dumps(schema_hint, indent=2)}\n"
+                repair_user += f"\nJSON schema hint:\n{dumps_json(schema_hint)}\n"
 
             repair_user += f"\nInvalid output:\n{raw}\n"
 
             try:
                 self._log("Attempting JSON repair")
-                raw2 = self._call(repair_system, repair_user, force_json)
+                raw2 = await self._call(repair_system, repair_user, force_json)
                 obj2, ok2 = self._try_parse(raw2)
                 if ok2 and isinstance(obj2, dict):
                     trace.append("json_repair_success")
@@ -135,3 +303,88 @@ class OpenAIJSONClient:
 
         self._log("Falling back to safe empty JSON")
         return {"ok": False, "data": {}, "raw": raw, "trace": trace}
+
+    async def generate_json_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        poll_interval: float = 30.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Run many independent JSON calls through the OpenAI Batch API.
+
+        For offline flows (evaluation runs) only: results may take up to
+        the 24h completion window. Each request is
+        {"system_prompt": str, "user_prompt": str, "force_json": bool,
+        "prompt_cache_key": str (optional), "schema": pydantic model (optional)}.
+
+        Returns one generate_json-shaped dict per request, in order.
+        There is no repair pass; unparseable outputs come back with ok=False.
+        """
+        if not requests:
+            return []
+
+        results: List[Dict[str, Any]] = [
+            {"ok": False, "data": {}, "raw": "", "trace": []} for _ in requests
+        ]
+
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as f:
+            for i, req in enumerate(requests):
+                line = {
+                    "custom_id": f"req-{i}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._chat_body(
+                        req["system_prompt"],
+                        req["user_prompt"],
+                        bool(req.get("force_json", True)),
+                        req.get("prompt_cache_key"),
+                        req.get("schema"),
+                    ),
+                }
+                f.write(dumps_json(line) + "\n")
+            path = f.name
+
+        try:
+            with open(path, "rb") as fh:
+                input_file = await self.client.files.create(file=fh, purpose="batch")
+        finally:
+            os.unlink(path)
+
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        self._log(f"Submitted batch {batch.id} with {len(requests)} requests")
+
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+            self._log(f"Batch {batch.id} status: {batch.status}")
+
+        # Expired / cancelled batches may still carry partial output
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = orjson.loads(line)
+                i = int(str(item.get("custom_id", "")).rsplit("-", 1)[-1])
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    results[i]["trace"].append("batch_request_failed")
+                    continue
+
+                raw = (response["body"]["choices"][0]["message"].get("content") or "").strip()
+                obj, ok = self._try_parse(raw)
+                if ok and isinstance(obj, dict):
+                    results[i] = {"ok": True, "data": obj, "raw": raw, "trace": []}
+                else:
+                    results[i] = {"ok": False, "data": {}, "raw": raw, "trace": ["json_parse_failed"]}
+
+        for res in results:
+            if not res["ok"] and not res["trace"]:
+                res["trace"].append(f"batch_{batch.status}")
+        return results
@@ -2,6 +2,7 @@ from __future__ import annotations
 from typing import Any, Dict
 from config import POCConfig
 from agents.openai_client import OpenAIJSONClient
+from agents.schemas import PlannerPlan
 
 
 class PlannerAgent:
@@ -18,6 +19,10 @@ class PlannerAgent:
             model="gpt-4o-mini",
             temperature=0.2,
             verbose=bool(cfg.verbose_openai),
+            cache_enabled=bool(cfg.cache_enabled),
+            semantic_cache_enabled=bool(cfg.semantic_cache_enabled),
+            cache_embedding_model=cfg.embedding_model_id,
+            cache_similarity_threshold=float(cfg.cache_similarity_threshold),
         )
         self.verbose = bool(cfg.verbose)
 
@@ -25,10 +30,25 @@ class PlannerAgent:
         if self.verbose:
             print(f"[PlannerAgent] {msg}")
 
-    def run(self, intent: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    async def run(self, intent: str, context: Dict[str, Any]) -> Dict[str, Any]:
         intent = (intent or "explore").strip().lower()
         query = (context.get("query") or "").strip()
 
+        # Hybrid search: skip the LLM and pin w_cf at min_cf_weight. This is a
+        # fixed plan, not what the LLM path would return (which could pick any
+        # w_cf in [min_cf_weight, max_cf_weight]).
+        if query and intent == "search" and self.cfg.enforce_hybrid_for_search:
+            w_cf = float(self.cfg.min_cf_weight)
+            out = {
+                "use_cf": True,
+                "use_semantic": True,
+                "weight_cf": w_cf,
+                "weight_semantic": 1.0 - w_cf,
+                "trace": ["deterministic_planner_shortcircuit"],
+            }
+            self._log(f"Plan (deterministic): w_cf={w_cf:.2f}, w_sem={1.0 - w_cf:.2f}")
+            return out
+
         system_prompt = (
             "You are a Netflix-style Strategy Planner for a movie recommender.\n"
             "You must output ONLY valid JSON.\n"
@@ -43,19 +63,12 @@ class PlannerAgent:
             f"Intent: {intent}\n"
             f"Query: {query}\n"
             f"Context JSON:\n{context}\n\n"
-            "Return JSON with exactly these keys:\n"
-            "{\n"
-            '  "use_cf": boolean,\n'
-            '  "use_semantic": boolean,\n'
-            '  "weight_cf": number (0..1),\n'
-            '  "weight_semantic": number (0..1),\n'
-            '  "trace": array of strings\n'
-            "}\n\n"
+            'Return JSON {"use_cf": boolean, "use_semantic": boolean, '
+            '"weight_cf": number 0..1, "weight_semantic": number 0..1, "trace": [string]}\n'
             "Rules:\n"
-            "- If Query is non-empty, use_semantic MUST be true.\n"
-            "- If intent is 'search' and hybrid enforcement is enabled, use_cf MUST be true.\n"
-            "- If both tools are used, weights MUST sum to 1.\n"
-            "- Avoid setting weight_cf to 0 when hybrid enforcement is enabled.\n"
+            "- Non-empty Query -> use_semantic true.\n"
+            "- Intent 'search' with hybrid enforcement -> use_cf true, weight_cf > 0.\n"
+            "- Both tools used -> weights sum to 1.\n"
         )
 
         schema_hint = {
@@ -66,12 +79,14 @@ class PlannerAgent:
             "trace": [],
         }
 
-        res = self.client.generate_json(
+        res = await self.client.generate_json(
             system_prompt=system_prompt,
             user_prompt=user_prompt,
             force_json=True,
             schema_hint=schema_hint,
             max_retries=1,
+            prompt_cache_key="planner_v1",
+            schema=PlannerPlan,
         )
 
         obj = res["data"] or {}
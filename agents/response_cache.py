@@ -0,0 +1,88 @@
+from __future__ import annotations
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticResponseCache:
+    """
+    Two-tier cache for LLM responses:
+    - exact match: sha256(system + user + model + temperature + variant) -> raw
+    - semantic match: cosine similarity of the user prompt embedding
+      against cached prompts sharing the same system prompt / model / variant
+
+    variant distinguishes otherwise identical prompts (e.g. response schema).
+
+    Entries are evicted oldest-first once max_entries is reached.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1024):
+        self.threshold = float(threshold)
+        self.max_entries = int(max_entries)
+
+        self._exact: "OrderedDict[str, str]" = OrderedDict()
+        # namespace -> (keys, embeddings matrix)
+        self._semantic: Dict[str, Tuple[List[str], np.ndarray]] = {}
+
+    @staticmethod
+    def exact_key(
+        system_prompt: str,
+        user_prompt: str,
+        model: str,
+        temperature: float,
+        variant: str = "",
+    ) -> str:
+        payload = "\x00".join([system_prompt, user_prompt, model, str(temperature), variant])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def namespace(system_prompt: str, model: str, temperature: float, variant: str = "") -> str:
+        payload = "\x00".join([system_prompt, model, str(temperature), variant])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def normalize(embedding) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32).ravel()
+        return v / (np.linalg.norm(v) + 1e-8)
+
+    def get_exact(self, key: str) -> Optional[str]:
+        raw = self._exact.get(key)
+        if raw is not None:
+            self._exact.move_to_end(key)
+        return raw
+
+    def get_semantic(self, namespace: str, embedding: Optional[np.ndarray]) -> Optional[str]:
+        if embedding is None or namespace not in self._semantic:
+            return None
+
+        keys, mat = self._semantic[namespace]
+        if not keys:
+            return None
+
+        sims = mat @ embedding
+        best = int(np.argmax(sims))
+        if float(sims[best]) < self.threshold:
+            return None
+        return self._exact.get(keys[best])
+
+    def put(self, key: str, namespace: str, raw: str, embedding: Optional[np.ndarray]) -> None:
+        self._exact[key] = raw
+        self._exact.move_to_end(key)
+
+        if embedding is not None:
+            keys, mat = self._semantic.get(namespace, ([], np.empty((0, embedding.shape[0]), np.float32)))
+            if key not in keys:
+                self._semantic[namespace] = (keys + [key], np.vstack([mat, embedding[None, :]]))
+
+        while len(self._exact) > self.max_entries:
+            old_key, _ = self._exact.popitem(last=False)
+            self._drop_semantic(old_key)
+
+    def _drop_semantic(self, key: str) -> None:
+        for ns, (keys, mat) in list(self._semantic.items()):
+            if key in keys:
+                i = keys.index(key)
+                self._semantic[ns] = (keys[:i] + keys[i + 1:], np.delete(mat, i, axis=0))
+                return
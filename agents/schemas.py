@@ -0,0 +1,53 @@
+from __future__ import annotations
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict
+
+
+# Response shapes for OpenAI strict structured outputs.
+# Strict mode requires every field to be present and no extra keys, so
+# optional values are modelled as nullable rather than defaulted.
+
+
+class IntentResult(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    intent: Literal["search", "explore", "comfort", "quick_watch"]
+    confidence: float
+    needs_clarification: bool
+    clarification_question: str
+    trace: List[str]
+
+
+class PlannerPlan(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    use_cf: bool
+    use_semantic: bool
+    weight_cf: float
+    weight_semantic: float
+    trace: List[str]
+
+
+class CriticAdjustments(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    weight_cf_delta: Optional[float]
+    weight_semantic_delta: Optional[float]
+    novelty_lambda: Optional[float]
+    diversity_boost: Optional[float]
+    exclude_genres: Optional[List[str]]
+
+
+class CriticVerdict(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    needs_rerank: bool
+    adjustments: CriticAdjustments
+    trace: List[str]
+
+
+class Explanation(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    one_liner: str
+    bullets: List[str]
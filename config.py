@@ -17,12 +17,28 @@ class POCConfig:
     embedding_path: str = "embeddings/movie_embeddings.npy"
     embedding_ids_path: str = "embeddings/movie_ids.json"
 
+    # Concurrent embedding requests during the one-time index build
+    embedding_max_workers: int = 16
+
+    # LRU of query embeddings (entries; each is embedding_dim float32s)
+    query_embedding_cache_size: int = 4096
+
+    # Semantic index backend: "none" = hnswlib float32;
+    # "fp16" / "int8" = FAISS HNSW over scalar-quantized vectors (needs faiss)
+    semantic_index_quantization: str = "none"
+
+    # Persisted CF fit (memory-mapped on load)
+    cf_cache_dir: str = "embeddings/cf_cache"
+
     # Retrieval sizes
 
     cf_k: int = 200
     semantic_k: int = 80
     final_k: int = 20
 
+    # LRU of retrieval results per (user_id, k) / (query, k) in the graph
+    retrieval_cache_size: int = 1024
+
     llm_model_id: str = "microsoft/phi-2"
     llm_max_new_tokens: int = 160
     llm_temperature: float = 0.2
@@ -35,12 +51,28 @@ class POCConfig:
     verbose_prompts: bool = False
     verbose_openai: bool = True
 
+    # LLM response cache. Exact tier: identical prompts only.
+    # Semantic tier (opt-in): reuses a response whose user prompt embeds within
+    # cache_similarity_threshold cosine. Planner / critic prompts are mostly
+    # fixed template text, so a different query or rec list can clear the
+    # threshold and receive another request's answer; each exact miss also
+    # pays an embeddings round-trip.
+
+    cache_enabled: bool = False
+    semantic_cache_enabled: bool = False
+    cache_similarity_threshold: float = 0.95
+
     # Strategy mode
 
     # v1 = baseline hybrid
     # v2 = agentic + critic + advantage-weighted
     strategy_version: str = "v2"
 
+    # Run the explainer concurrently with the critic. It is cancelled when the
+    # critic requests a rerank (skipped if the critic short-circuits), so a
+    # rerank still costs one explainer call, made after reranking.
+    speculative_explain: bool = True
+
     # Planner constraints
 
     enforce_hybrid_for_search: bool = True
@@ -58,6 +90,21 @@ class POCConfig:
 
     critic_topn: int = 10
 
+    # A critic rerank whose weight deltas are all below this reuses the current recs
+    rerank_min_weight_delta: float = 0.01
+
+    # Skip the LLM critique when guardrails already force a rerank
+    # with at least this many adjustments; requires prefer_weight_adjustments,
+    # since the rerank only acts on the weight deltas below
+    critic_shortcircuit: bool = True
+    critic_shortcircuit_min_adjustments: int = 2
+    critic_shortcircuit_cf_delta: float = -0.10
+    critic_shortcircuit_semantic_delta: float = 0.10
+
+    # Offline evaluation: enqueue critic calls on the OpenAI Batch API
+    use_batch_api_for_eval: bool = False
+    batch_poll_interval_s: float = 30.0
+
     # Popularity control
     popularity_mean_threshold: float = 0.65
 
@@ -1,5 +1,49 @@
+import asyncio
+import functools
+import operator
+import threading
+from collections import Counter
+import numpy as np
 from langgraph.graph import StateGraph, START, END
-from typing import Dict, Any
+from typing import Annotated, Any, Dict, List, Optional, TypedDict
+from rankers.scoring import candidate_arrays
+
+
+def _frozen_columns(result: Any, score_col: str) -> Dict[str, np.ndarray]:
+    """
+    Retrieval result as {"movieId", score_col} read-only arrays, so a cached
+    result can be handed to every caller without copying.
+    """
+    ids, scores = candidate_arrays(result, score_col)
+    ids.flags.writeable = False
+    scores.flags.writeable = False
+    return {"movieId": ids, score_col: scores}
+
+
+def _row_count(result: Any) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        return int(len(result.get("movieId", ())))
+    return int(len(result))
+
+
+class GraphState(TypedDict, total=False):
+    """
+    Graph state. Nodes return only the keys they change; LangGraph merges
+    them, and trace_log events are appended by its reducer.
+    """
+    user_id: Any
+    context: Dict[str, Any]
+    intent_obj: Dict[str, Any]
+    plan: Dict[str, Any]
+    cf: Any
+    sem: Any
+    recs: List[Dict[str, Any]]
+    rank_ctx: Optional[Dict[str, Any]]
+    critic: Dict[str, Any]
+    explanation: Optional[Dict[str, Any]]
+    trace_log: Annotated[List[Dict[str, Any]], operator.add]
 
 
 class AgenticGraph:
@@ -8,8 +52,11 @@ class AgenticGraph:
 
     Key points:
     - uses intent_obj key
-    - trace_log is appended at each node
+    - nodes return state deltas; trace_log is appended at each node
     - supports critic-driven rerank adjustments
+    - LLM nodes are async: run with `await graph.ainvoke(...)`; independent
+      LLM / tool calls inside a node are issued concurrently
+    - stats() reports rank / rerank / cache counters for tuning
     """
 
     def __init__(self, agents, tools, ranker, cfg):
@@ -18,93 +65,155 @@ class AgenticGraph:
         self.ranker = ranker
         self.cfg = cfg
 
+        # Same (user_id, k) / (query, k) recur within a session and across
+        # rerank loops; tools are immutable once built, so results are reusable.
+        cache_size = int(getattr(cfg, "retrieval_cache_size", 1024))
+        self._cf_cached = functools.lru_cache(maxsize=cache_size)(
+            lambda user_id, k: _frozen_columns(self.tools["cf"].recommend(user_id, k), "cf_score")
+        )
+        self._sem_cached = functools.lru_cache(maxsize=cache_size)(
+            lambda query, k: _frozen_columns(self.tools["semantic"].search(query, k), "semantic_score")
+        )
+
+        self._stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _bump(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Snapshot of graph counters, retrieval LRU hits / misses, and the
+        tools' own counters (prefixed with the tool name).
+        """
+        with self._stats_lock:
+            out = dict(self._stats)
+
+        for name, cached in (("cf", self._cf_cached), ("sem", self._sem_cached)):
+            info = cached.cache_info()
+            out[f"{name}_cache_hits"] = info.hits
+            out[f"{name}_cache_misses"] = info.misses
+
+        for name, tool in self.tools.items():
+            tool_stats = getattr(tool, "stats", None)
+            if isinstance(tool_stats, Counter):
+                out.update({f"{name}.{k}": v for k, v in tool_stats.items()})
+        return out
+
     def build(self):
-        graph = StateGraph(dict)
-
-        def _append_trace(state: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
-            trace = list(state.get("trace_log", []))
-            trace.append(event)
-            return {**state, "trace_log": trace}
-
-        def intent_node(state: Dict[str, Any]) -> Dict[str, Any]:
-            intent_obj = self.agents["intent"].run(state["context"])
-            state2 = {**state, "intent_obj": intent_obj}
-            return _append_trace(
-                state2,
-                {
+        graph = StateGraph(GraphState)
+
+        async def intent_node(state: Dict[str, Any]) -> Dict[str, Any]:
+            intent_obj = await self.agents["intent"].run(state["context"])
+            return {
+                "intent_obj": intent_obj,
+                "trace_log": [{
                     "node": "intent",
                     "intent": intent_obj.get("intent"),
                     "confidence": intent_obj.get("confidence"),
                     "trace": intent_obj.get("trace", []),
-                },
-            )
+                }],
+            }
 
-        def plan_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        async def plan_node(state: Dict[str, Any]) -> Dict[str, Any]:
             intent = (state.get("intent_obj") or {}).get("intent", "explore")
-            plan = self.agents["planner"].run(intent, state["context"])
-            state2 = {**state, "plan": plan}
-            return _append_trace(
-                state2,
-                {
+            plan = await self.agents["planner"].run(intent, state["context"])
+            return {
+                "plan": plan,
+                "trace_log": [{
                     "node": "plan",
                     "use_cf": plan.get("use_cf"),
                     "use_semantic": plan.get("use_semantic"),
                     "weights": {"cf": plan.get("weight_cf"), "semantic": plan.get("weight_semantic")},
-                },
-            )
+                }],
+            }
 
-        def retrieve_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        async def retrieve_node(state: Dict[str, Any]) -> Dict[str, Any]:
             updates = {}
             plan = state.get("plan") or {}
             use_cf = bool(plan.get("use_cf", True))
             use_sem = bool(plan.get("use_semantic", False))
 
+            # CF (CPU) and semantic search (network) are independent
+            tasks = {}
             if use_cf:
-                updates["cf"] = self.tools["cf"].recommend(state["user_id"], self.cfg.cf_k)
+                tasks["cf"] = asyncio.to_thread(self._cf_cached, state["user_id"], self.cfg.cf_k)
 
             if use_sem:
                 query = (state["context"].get("query") or "").strip()
                 if query:
-                    updates["sem"] = self.tools["semantic"].search(query, self.cfg.semantic_k)
+                    tasks["sem"] = asyncio.to_thread(self._sem_cached, query, self.cfg.semantic_k)
                 else:
                     updates["sem"] = []
 
-            state2 = {**state, **updates}
-            return _append_trace(
-                state2,
-                {
-                    "node": "retrieve",
-                    "use_cf": use_cf,
-                    "use_semantic": use_sem,
-                    "cf_rows": int(len(state2.get("cf"))) if state2.get("cf") is not None else 0,
-                    "sem_rows": int(len(state2.get("sem"))) if state2.get("sem") is not None else 0,
-                },
-            )
+            results = await asyncio.gather(*tasks.values())
+            updates.update(zip(tasks.keys(), results))
+
+            updates["trace_log"] = [{
+                "node": "retrieve",
+                "use_cf": use_cf,
+                "use_semantic": use_sem,
+                "cf_rows": _row_count(updates.get("cf", state.get("cf"))),
+                "sem_rows": _row_count(updates.get("sem", state.get("sem"))),
+            }]
+            return updates
 
         def rank_node(state: Dict[str, Any]) -> Dict[str, Any]:
-            recs = self.ranker(state)
-            state2 = {**state, "recs": recs}
+            # Keep the weight-independent ranking context for a cheap rerank
+            recs, rank_ctx = self.ranker.rank(state)
+            self._bump("n_rank_calls")
             top = recs[0]["title"] if recs else None
-            return _append_trace(state2, {"node": "rank", "top1": top, "recs_count": len(recs)})
+            return {
+                "recs": recs,
+                "rank_ctx": rank_ctx,
+                "trace_log": [{"node": "rank", "top1": top, "recs_count": len(recs)}],
+            }
 
-        def critic_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        async def critic_node(state: Dict[str, Any]) -> Dict[str, Any]:
             intent = (state.get("intent_obj") or {}).get("intent", "explore")
-            critic = self.agents["critic"].run(intent, state["context"], state.get("recs", []))
-            state2 = {**state, "critic": critic}
-            return _append_trace(
-                state2,
-                {
-                    "node": "critic",
-                    "needs_rerank": critic.get("needs_rerank"),
-                    "adjustments": critic.get("adjustments", {}),
-                },
-            )
+            recs = state.get("recs", [])
+            critic_agent = self.agents["critic"]
+
+            # Speculatively explain the current recs while the critic runs. The
+            # explainer is cancelled as soon as the critic asks for a rerank, and
+            # not started at all when the critic will short-circuit to one.
+            updates: Dict[str, Any] = {}
+            explain_task = None
+            if getattr(self.cfg, "speculative_explain", False) and not (
+                hasattr(critic_agent, "would_shortcircuit")
+                and critic_agent.would_shortcircuit(state["context"], recs)
+            ):
+                explain_task = asyncio.create_task(
+                    self.agents["explainer"].run(intent, state.get("plan", {}), recs)
+                )
+
+            try:
+                critic = await critic_agent.run(intent, state["context"], recs)
+            except BaseException:
+                if explain_task is not None:
+                    explain_task.cancel()
+                raise
+
+            if explain_task is not None:
+                if critic.get("needs_rerank"):
+                    explain_task.cancel()
+                    self._bump("speculative_explain_cancelled")
+                else:
+                    updates["explanation"] = await explain_task
+            updates["critic"] = critic
+            updates["trace_log"] = [{
+                "node": "critic",
+                "needs_rerank": critic.get("needs_rerank"),
+                "adjustments": critic.get("adjustments", {}),
+            }]
+            return updates
 
         def should_rerank(state: Dict[str, Any]) -> str:
             critic = state.get("critic") or {}
             return "rerank" if bool(critic.get("needs_rerank", False)) else "explain"
 
-        def rerank_node(state: Dict[str, Any]) -> Dict[str, Any]:
+        async def rerank_node(state: Dict[str, Any]) -> Dict[str, Any]:
             """
             Apply critic adjustments in-state and re-rank once.
             We do NOT mutate global cfg; we only tweak state knobs.
@@ -118,9 +227,11 @@ class AgenticGraph:
             w_cf = float(plan.get("weight_cf", 0.4))
             w_sem = float(plan.get("weight_semantic", 0.6))
 
-            w_cf_delta = float(adj.get("weight_cf_delta", 0.0))
-            w_sem_delta = float(adj.get("weight_semantic_delta", 0.0))
+            # Strict-schema critiques send null for "no change"
+            w_cf_delta = float(adj.get("weight_cf_delta") or 0.0)
+            w_sem_delta = float(adj.get("weight_semantic_delta") or 0.0)
 
+            w_cf_old, w_sem_old = w_cf, w_sem
             w_cf = max(0.0, min(1.0, w_cf + w_cf_delta))
             w_sem = max(0.0, min(1.0, w_sem + w_sem_delta))
 
@@ -132,33 +243,72 @@ class AgenticGraph:
             else:
                 w_cf, w_sem = 0.0, 1.0
 
+            # Keep the planner's hybrid rule: search never drops CF below min_cf_weight
+            intent = (state.get("intent_obj") or {}).get("intent", "explore")
+            clamped = False
+            if self.cfg.enforce_hybrid_for_search and intent == "search":
+                w_cf_clamped = min(max(w_cf, float(self.cfg.min_cf_weight)), float(self.cfg.max_cf_weight))
+                clamped = abs(w_cf_clamped - w_cf) > 1e-9
+                w_cf, w_sem = w_cf_clamped, 1.0 - w_cf_clamped
+
+            # Weights are the only knob rescore() reads: without a (non-negligible)
+            # shift the recs would be reproduced, so keep them (and any explanation).
+            # "no_weight_adjustment" means the critic asked for a rerank but gave
+            # no weight delta; "equal_hit" means the resulting weights moved less
+            # than the threshold (small deltas, or clamped back by the hybrid rule).
+            skipped = None
+            if adj.get("weight_cf_delta") is None and adj.get("weight_semantic_delta") is None:
+                skipped = "no_weight_adjustment"
+                self._bump("rerank_no_weight_adjustments")
+            elif max(abs(w_cf - w_cf_old), abs(w_sem - w_sem_old)) < float(self.cfg.rerank_min_weight_delta):
+                skipped = "equal_hit"
+                self._bump("rerank_equal_hits")
+
+            if skipped is not None:
+                recs = state.get("recs", [])
+                return {
+                    "trace_log": [{
+                        "node": "rerank",
+                        "applied_adjustments": adj,
+                        "skipped": skipped,
+                        "clamped_to_hybrid_bounds": clamped,
+                        "top1": recs[0]["title"] if recs else None,
+                    }],
+                }
+
             plan["weight_cf"] = float(w_cf)
             plan["weight_semantic"] = float(w_sem)
             plan_trace = list(plan.get("trace", [])) if isinstance(plan.get("trace", []), list) else []
             plan_trace.append("critic_rerank_applied")
             plan["trace"] = plan_trace
 
-            state2 = {**state, "plan": plan}
-
-            # Re-rank once
-            recs = self.ranker(state2)
-            state3 = {**state2, "recs": recs}
+            # Re-rank once: only the weighted fusion + top-k are redone
+            recs = self.ranker.rescore(state.get("rank_ctx"), plan["weight_cf"], plan["weight_semantic"])
+            self._bump("n_rerank_fastpath_hits")
 
-            return _append_trace(
-                state3,
-                {
+            return {
+                "plan": plan,
+                "recs": recs,
+                # Any speculative explanation described the pre-rerank recs
+                "explanation": None,
+                "trace_log": [{
                     "node": "rerank",
                     "applied_adjustments": adj,
                     "new_weights": {"cf": plan["weight_cf"], "semantic": plan["weight_semantic"]},
+                    "clamped_to_hybrid_bounds": clamped,
                     "top1": recs[0]["title"] if recs else None,
-                },
-            )
+                }],
+            }
 
-        def explain_node(state: Dict[str, Any]) -> Dict[str, Any]:
-            intent = (state.get("intent_obj") or {}).get("intent", "explore")
-            explanation = self.agents["explainer"].run(intent, state.get("plan", {}), state.get("recs", []))
-            state2 = {**state, "explanation": explanation}
-            return _append_trace(state2, {"node": "explain", "one_liner": explanation.get("one_liner", "")})
+        async def explain_node(state: Dict[str, Any]) -> Dict[str, Any]:
+            explanation = state.get("explanation")
+            if explanation is None:
+                intent = (state.get("intent_obj") or {}).get("intent", "explore")
+                explanation = await self.agents["explainer"].run(intent, state.get("plan", {}), state.get("recs", []))
+            return {
+                "explanation": explanation,
+                "trace_log": [{"node": "explain", "one_liner": explanation.get("one_liner", "")}],
+            }
 
         graph.add_node("intent", intent_node)
         graph.add_node("plan", plan_node)
@@ -1,6 +1,8 @@
 from __future__ import annotations
-from typing import Any, Dict, List
-import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+from rankers.scoring import prepare_candidates, top_k_indices
+from tools.movie_catalog import MovieCatalog
 
 
 class RankerV1:
@@ -8,55 +10,58 @@ class RankerV1:
     Baseline v1 ranker:
     - linear fusion of normalized CF and semantic scores
     - no advantage weighting
+
+    prepare() does the weight-independent work once; rescore() re-fuses it
+    for new plan weights (used by the orchestrator's rerank).
     """
 
-    def __init__(self, cfg, movie_map: Dict[int, Dict[str, str]]):
+    def __init__(self, cfg, movie_map: Union[MovieCatalog, Dict[int, Dict[str, str]]]):
         self.cfg = cfg
-        self.movie_map = movie_map
+        # Struct-of-arrays title/genre lookup; legacy dict maps are converted once
+        self.catalog = movie_map if isinstance(movie_map, MovieCatalog) else MovieCatalog.from_map(movie_map)
+        self._final_k = int(cfg.final_k)
 
     def __call__(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
-        cf = state.get("cf", pd.DataFrame())
-        sem = pd.DataFrame(state.get("sem", []))
+        return self.rank(state)[0]
 
-        if cf is None or isinstance(cf, list):
-            cf = pd.DataFrame(cf)
-        if sem is None:
-            sem = pd.DataFrame()
+    def rank(self, state: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, np.ndarray]]]:
+        ctx = self.prepare(state)
+        plan = state.get("plan", {}) or {}
+        w_cf = float(plan.get("weight_cf", 0.5))
+        w_sem = float(plan.get("weight_semantic", 0.5))
+        return self.rescore(ctx, w_cf, w_sem), ctx
 
-        if cf.empty and sem.empty:
-            return []
+    def prepare(self, state: Dict[str, Any]) -> Optional[Dict[str, np.ndarray]]:
+        return prepare_candidates(state)
 
-        if not cf.empty and not sem.empty:
-            df = cf.merge(sem, on="movieId", how="outer").fillna(0.0)
-        elif not cf.empty:
-            df = cf.assign(semantic_score=0.0)
-        else:
-            df = sem.assign(cf_score=0.0)
+    def rescore(
+        self,
+        ctx: Optional[Dict[str, np.ndarray]],
+        w_cf: float,
+        w_sem: float,
+    ) -> List[Dict[str, Any]]:
+        if ctx is None:
+            return []
 
-        for col in ["cf_score", "semantic_score"]:
-            mx = float(df[col].max()) if len(df) else 0.0
-            if mx > 0:
-                df[col] = df[col] / mx
+        mids, cf, sem = ctx["ids"], ctx["cf"], ctx["sem"]
+        score = w_cf * cf + w_sem * sem
 
-        w_cf = float(state["plan"].get("weight_cf", 0.5))
-        w_sem = float(state["plan"].get("weight_semantic", 0.5))
-        df["score"] = w_cf * df["cf_score"] + w_sem * df["semantic_score"]
+        top_idx = top_k_indices(score, self._final_k)
 
-        df = df.sort_values("score", ascending=False).head(self.cfg.final_k)
+        titles, genres = self.catalog.lookup(mids[top_idx])
 
         recs: List[Dict[str, Any]] = []
-        for r in df.itertuples(index=False):
-            mid = int(r.movieId)
-            meta = self.movie_map.get(mid, {"title": "Unknown", "genres": ""})
+        for i, title, genre in zip(top_idx, titles, genres):
+            mid = int(mids[i])
             recs.append(
                 {
                     "movieId": mid,
-                    "title": meta.get("title", "Unknown"),
-                    "genres": meta.get("genres", ""),
-                    "score": float(r.score),
+                    "title": title,
+                    "genres": genre,
+                    "score": float(score[i]),
                     "signals": {
-                        "cf": float(getattr(r, "cf_score", 0.0)),
-                        "semantic": float(getattr(r, "semantic_score", 0.0)),
+                        "cf": float(cf[i]),
+                        "semantic": float(sem[i]),
                     },
                 }
             )
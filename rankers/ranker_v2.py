@@ -1,7 +1,9 @@
 from __future__ import annotations
-from typing import Any, Dict, List
-import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+from rankers.scoring import prepare_candidates, score_and_topk
 from tools.item_stats import ItemStats
+from tools.movie_catalog import MovieCatalog
 
 
 class RankerV2:
@@ -16,75 +18,81 @@ class RankerV2:
     5) advantage = utility - advantage_alpha * baseline
     6) novelty_boost = novelty_lambda * (1 - popularity_norm)
     7) final = advantage + novelty_boost
+
+    Steps 1-2 and the baseline lookup live in prepare(); rescore() redoes
+    only the weighted fusion, so a rerank with new weights is cheap.
     """
 
-    def __init__(self, cfg, movie_map: Dict[int, Dict[str, str]], item_stats: ItemStats):
+    def __init__(self, cfg, movie_map: Union[MovieCatalog, Dict[int, Dict[str, str]]], item_stats: ItemStats):
         self.cfg = cfg
-        self.movie_map = movie_map
+        # Struct-of-arrays title/genre lookup; legacy dict maps are converted once
+        self.catalog = movie_map if isinstance(movie_map, MovieCatalog) else MovieCatalog.from_map(movie_map)
         self.item_stats = item_stats
 
-    def __call__(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
-        cf = state.get("cf", pd.DataFrame())
-        sem = pd.DataFrame(state.get("sem", []))
-
-        if cf is None or isinstance(cf, list):
-            cf = pd.DataFrame(cf)
-        if sem is None:
-            sem = pd.DataFrame()
-
-        if cf.empty and sem.empty:
-            return []
+        # cfg is read-only after construction; keep the per-call constants local
+        self._alpha = float(cfg.advantage_alpha)
+        self._novelty = float(cfg.novelty_lambda)
+        self._final_k = int(cfg.final_k)
+        # utility - alpha*b + novelty*(1 - b) == utility - (alpha + novelty)*b + novelty
+        self._baseline_coef = self._alpha + self._novelty
 
-        if not cf.empty and not sem.empty:
-            df = cf.merge(sem, on="movieId", how="outer").fillna(0.0)
-        elif not cf.empty:
-            df = cf.assign(semantic_score=0.0)
-        else:
-            df = sem.assign(cf_score=0.0)
-
-        # normalize signals
-        for col in ["cf_score", "semantic_score"]:
-            mx = float(df[col].max()) if len(df) else 0.0
-            if mx > 0:
-                df[col] = df[col] / mx
+    def __call__(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self.rank(state)[0]
 
+    def rank(self, state: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, np.ndarray]]]:
+        ctx = self.prepare(state)
         plan = state.get("plan", {}) or {}
         w_cf = float(plan.get("weight_cf", 0.4))
         w_sem = float(plan.get("weight_semantic", 0.6))
+        return self.rescore(ctx, w_cf, w_sem), ctx
+
+    def prepare(self, state: Dict[str, Any]) -> Optional[Dict[str, np.ndarray]]:
+        ctx = prepare_candidates(state)
+        if ctx is not None:
+            # baseline = popularity_norm proxy (expected utility)
+            ctx["baseline"] = self.item_stats.popularity_for(ctx["ids"])
+        return ctx
+
+    def rescore(
+        self,
+        ctx: Optional[Dict[str, np.ndarray]],
+        w_cf: float,
+        w_sem: float,
+    ) -> List[Dict[str, Any]]:
+        if ctx is None:
+            return []
 
-        # utility = hybrid relevance / preference signal
-        df["utility"] = w_cf * df["cf_score"] + w_sem * df["semantic_score"]
-
-        # baseline = popularity_norm proxy (expected utility)
-        df["baseline"] = df["movieId"].apply(lambda mid: self.item_stats.get_popularity(int(mid)))
+        mids, cf, sem, baseline = ctx["ids"], ctx["cf"], ctx["sem"], ctx["baseline"]
 
-        # advantage + novelty
-        alpha = float(self.cfg.advantage_alpha)
-        novelty_lambda = float(self.cfg.novelty_lambda)
+        alpha = self._alpha
+        novelty_lambda = self._novelty
 
-        df["advantage"] = df["utility"] - alpha * df["baseline"]
-        df["novelty_boost"] = novelty_lambda * (1.0 - df["baseline"])
-        df["score"] = df["advantage"] + df["novelty_boost"]
+        # utility - alpha * baseline + novelty_lambda * (1 - baseline), folded;
+        # only the top-k are materialized
+        top_idx, top_scores = score_and_topk(
+            cf, sem, baseline, w_cf, w_sem, self._baseline_coef, novelty_lambda, self._final_k
+        )
+        utility = w_cf * cf[top_idx] + w_sem * sem[top_idx]
 
-        df = df.sort_values("score", ascending=False).head(self.cfg.final_k)
+        titles, genres = self.catalog.lookup(mids[top_idx])
 
         recs: List[Dict[str, Any]] = []
-        for r in df.itertuples(index=False):
-            mid = int(r.movieId)
-            meta = self.movie_map.get(mid, {"title": "Unknown", "genres": ""})
+        for r, (i, title, genre) in enumerate(zip(top_idx, titles, genres)):
+            mid = int(mids[i])
+            b = float(baseline[i])
             recs.append(
                 {
                     "movieId": mid,
-                    "title": meta.get("title", "Unknown"),
-                    "genres": meta.get("genres", ""),
-                    "score": float(r.score),
+                    "title": title,
+                    "genres": genre,
+                    "score": float(top_scores[r]),
                     "signals": {
-                        "cf": float(getattr(r, "cf_score", 0.0)),
-                        "semantic": float(getattr(r, "semantic_score", 0.0)),
-                        "utility": float(getattr(r, "utility", 0.0)),
-                        "baseline_popularity": float(getattr(r, "baseline", 0.0)),
-                        "advantage": float(getattr(r, "advantage", 0.0)),
-                        "novelty_boost": float(getattr(r, "novelty_boost", 0.0)),
+                        "cf": float(cf[i]),
+                        "semantic": float(sem[i]),
+                        "utility": float(utility[r]),
+                        "baseline_popularity": b,
+                        "advantage": float(utility[r]) - alpha * b,
+                        "novelty_boost": novelty_lambda * (1.0 - b),
                     },
                 }
             )
@@ -0,0 +1,179 @@
+from __future__ import annotations
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # optional: fall back to the NumPy kernel
+    njit = None
+
+
+def top_k_indices(score: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first.
+
+    O(N) argpartition + O(k log k) sort of the winners instead of a full sort.
+    """
+    k = min(int(k), len(score))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top_idx = np.argpartition(score, -k)[-k:]
+    return top_idx[np.argsort(-score[top_idx])]
+
+
+def _score_and_topk_loop(
+    cf: np.ndarray,
+    sem: np.ndarray,
+    baseline: np.ndarray,
+    w_cf: float,
+    w_sem: float,
+    baseline_coef: float,
+    offset: float,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # One pass: fused score per candidate into a bounded min-heap of size k
+    n = cf.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    heap_s = np.empty(k, dtype=np.float64)
+    heap_i = np.empty(k, dtype=np.int64)
+    size = 0
+    for i in range(n):
+        s = w_cf * cf[i] + w_sem * sem[i] - baseline_coef * baseline[i] + offset
+        if size < k:
+            # sift up
+            j = size
+            size += 1
+            while j > 0:
+                parent = (j - 1) // 2
+                if heap_s[parent] <= s:
+                    break
+                heap_s[j] = heap_s[parent]
+                heap_i[j] = heap_i[parent]
+                j = parent
+            heap_s[j] = s
+            heap_i[j] = i
+        elif s > heap_s[0]:
+            # replace the current minimum, sift down
+            j = 0
+            while True:
+                child = 2 * j + 1
+                if child >= k:
+                    break
+                if child + 1 < k and heap_s[child + 1] < heap_s[child]:
+                    child += 1
+                if heap_s[child] >= s:
+                    break
+                heap_s[j] = heap_s[child]
+                heap_i[j] = heap_i[child]
+                j = child
+            heap_s[j] = s
+            heap_i[j] = i
+
+    order = np.argsort(-heap_s)
+    return heap_i[order], heap_s[order]
+
+
+def _score_and_topk_numpy(
+    cf: np.ndarray,
+    sem: np.ndarray,
+    baseline: np.ndarray,
+    w_cf: float,
+    w_sem: float,
+    baseline_coef: float,
+    offset: float,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    score = w_cf * cf + w_sem * sem - baseline_coef * baseline + offset
+    top_idx = top_k_indices(score, k)
+    return top_idx, score[top_idx].astype(np.float64)
+
+
+_score_and_topk = (
+    njit(cache=True, fastmath=True)(_score_and_topk_loop) if njit is not None else _score_and_topk_numpy
+)
+
+
+def score_and_topk(
+    cf: np.ndarray,
+    sem: np.ndarray,
+    baseline: np.ndarray,
+    w_cf: float,
+    w_sem: float,
+    baseline_coef: float,
+    offset: float,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k of w_cf*cf + w_sem*sem - baseline_coef*baseline + offset, best
+    first, as (indices, scores).
+
+    Compiled single-pass kernel with a bounded heap when numba is installed;
+    the equivalent NumPy expression + argpartition otherwise.
+    """
+    return _score_and_topk(
+        cf, sem, baseline, float(w_cf), float(w_sem), float(baseline_coef), float(offset), int(k)
+    )
+
+
+def candidate_arrays(candidates: Any, score_col: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (movieId int64, score float32) arrays from a retrieval result: a DataFrame,
+    a dict of columns, or a list of row dicts. None / empty -> empty arrays.
+    """
+    if candidates is None or len(candidates) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    if isinstance(candidates, list):
+        ids = [c["movieId"] for c in candidates]
+        scores = [c[score_col] for c in candidates]
+    else:
+        ids = candidates["movieId"]
+        scores = candidates[score_col]
+
+    return np.asarray(ids, dtype=np.int64), np.asarray(scores, dtype=np.float32)
+
+
+def union_candidates(
+    cf_ids: np.ndarray,
+    cf_scores: np.ndarray,
+    sem_ids: np.ndarray,
+    sem_scores: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Outer-join CF and semantic candidates on movieId (missing side = 0.0).
+
+    Returns (ids, cf_score, semantic_score) aligned on the unique ids.
+    """
+    ids, inv = np.unique(np.concatenate([cf_ids, sem_ids]), return_inverse=True)
+    n_cf = len(cf_ids)
+    cf = np.bincount(inv[:n_cf], weights=cf_scores, minlength=len(ids)).astype(np.float32)
+    sem = np.bincount(inv[n_cf:], weights=sem_scores, minlength=len(ids)).astype(np.float32)
+    return ids, cf, sem
+
+
+def prepare_candidates(state: Dict[str, Any]) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Weight-independent part of ranking: join CF + semantic candidates and
+    max-normalize each signal. None when there are no candidates.
+
+    Returns {"ids": int64, "cf": float32, "sem": float32}, aligned.
+    """
+    cf_ids, cf_scores = candidate_arrays(state.get("cf"), "cf_score")
+    sem_ids, sem_scores = candidate_arrays(state.get("sem"), "semantic_score")
+
+    if not len(cf_ids) and not len(sem_ids):
+        return None
+
+    # Outer join on movieId via a sorted-id union; missing side scores 0.0
+    ids, cf, sem = union_candidates(cf_ids, cf_scores, sem_ids, sem_scores)
+
+    # normalize signals
+    for col in (cf, sem):
+        mx = float(col.max()) if len(col) else 0.0
+        if mx > 0:
+            col /= mx
+
+    return {"ids": ids, "cf": cf, "sem": sem}
@@ -1,5 +1,12 @@
+import hashlib
+import os
+import threading
+from collections import Counter
 import numpy as np
+import orjson
 import pandas as pd
+import scipy.sparse as sp
+import torch
 from typing import Dict, Optional
 
 
@@ -12,45 +19,152 @@ class SimpleCFRecommender:
     - Fully explainable
     - No stochastic components
     - Safe fallbacks for unknown users
+    - Optional CUDA scoring (device="cuda"); CPU uses scipy.sparse
     """
 
-    def __init__(self):
+    def __init__(self, device: Optional[str] = None):
+        self.device = device
         self.users = None
         self.items = None
         self.user_idx: Dict[int, int] = {}
         self.item_idx: Dict[int, int] = {}
-        self.idx_item: Dict[int, int] = {}
-        self.sim: Optional[np.ndarray] = None
-        self.mat: Optional[np.ndarray] = None
+        self.items_arr: Optional[np.ndarray] = None
+        self.item_mat_normalized: Optional[sp.csr_matrix] = None
+        self.mat: Optional[sp.csr_matrix] = None
+        self._item_t: Optional[torch.Tensor] = None
+
+        # recommend_calls / unknown_user (empty result)
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
 
     def fit(self, ratings: pd.DataFrame) -> None:
         """
-        Build an implicit user–item interaction matrix and
-        compute item–item cosine similarity.
+        Build an implicit user–item interaction matrix and the
+        L2-normalized item matrix used for item–item cosine similarity.
+
+        The full item–item similarity matrix is never materialized.
         """
-        self.users = ratings["userId"].unique()
-        self.items = ratings["movieId"].unique()
+        # One C-level pass per column yields both the codes and the uniques
+        user_codes, users = pd.factorize(ratings["userId"], sort=False)
+        item_codes, items = pd.factorize(ratings["movieId"], sort=False)
+        self.users = np.asarray(users)
+        self.items = np.asarray(items)
 
+        # Dicts only serve external id lookups, not matrix assembly
         self.user_idx = {int(u): i for i, u in enumerate(self.users)}
         self.item_idx = {int(m): i for i, m in enumerate(self.items)}
-        self.idx_item = {i: m for m, i in self.item_idx.items()}
+        self.items_arr = np.asarray(self.items, dtype=np.int64)
 
-        interaction_matrix = np.zeros(
-            (len(self.users), len(self.items)),
-            dtype=np.float32
-        )
+        u = user_codes.astype(np.int32, copy=False)
+        i = item_codes.astype(np.int32, copy=False)
 
-        for row in ratings.itertuples(index=False):
-            u = int(row.userId)
-            m = int(row.movieId)
-            interaction_matrix[self.user_idx[u], self.item_idx[m]] = 1.0
+        # int8 payload: this matrix is only read for its sparsity structure.
+        data = np.ones(len(ratings), dtype=np.int8)
 
-        item_matrix = interaction_matrix.T
-        norms = np.linalg.norm(item_matrix, axis=1, keepdims=True) + 1e-8
-        item_matrix = item_matrix / norms
+        interaction_matrix = sp.csr_matrix(
+            (data, (u, i)),
+            shape=(len(self.users), len(self.items)),
+            dtype=np.int8,
+        )
+        # Duplicate (user, item) pairs are summed on construction; keep it binary.
+        interaction_matrix.data[:] = 1
+
+        # Rows are binary, so each item's L2 norm is sqrt(#interactions) and
+        # normalizing is a per-row scale of the float32 payload.
+        item_matrix = interaction_matrix.T.tocsr().astype(np.float32)
+        row_nnz = np.diff(item_matrix.indptr)
+        norms = np.sqrt(row_nnz).astype(np.float32) + 1e-8
+        item_matrix.data *= np.repeat(1.0 / norms, row_nnz)
 
-        self.sim = item_matrix @ item_matrix.T
+        self.item_mat_normalized = item_matrix.tocsr()
         self.mat = interaction_matrix
+        self._to_device()
+
+    def _to_device(self) -> None:
+        """
+        Mirror the normalized item matrix on the GPU as a sparse CSR tensor.
+        """
+        self._item_t = None
+        if not str(self.device or "").startswith("cuda"):
+            return
+
+        m = self.item_mat_normalized
+        self._item_t = torch.sparse_csr_tensor(
+            torch.from_numpy(np.asarray(m.indptr, dtype=np.int64)),
+            torch.from_numpy(np.asarray(m.indices, dtype=np.int64)),
+            torch.from_numpy(np.asarray(m.data, dtype=np.float32)),
+            size=m.shape,
+            device=self.device,
+        )
+
+    @staticmethod
+    def _fingerprint(ratings: pd.DataFrame) -> str:
+        """
+        Cheap content fingerprint of the interactions fit() depends on.
+        """
+        parts = [str(ratings.shape)]
+        if "timestamp" in ratings.columns and len(ratings):
+            parts.append(str(ratings["timestamp"].max()))
+        hashed = pd.util.hash_pandas_object(ratings[["userId", "movieId"]], index=False)
+        parts.append(str(int(hashed.to_numpy().sum(dtype=np.uint64))))
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def _save(self, cache_dir: str, fingerprint: str) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        shapes = {}
+        for name, m in (("mat", self.mat), ("item_mat", self.item_mat_normalized)):
+            np.save(os.path.join(cache_dir, f"{name}_data.npy"), m.data)
+            np.save(os.path.join(cache_dir, f"{name}_indices.npy"), m.indices)
+            np.save(os.path.join(cache_dir, f"{name}_indptr.npy"), m.indptr)
+            shapes[name] = list(m.shape)
+
+        np.save(os.path.join(cache_dir, "users.npy"), np.asarray(self.users))
+        np.save(os.path.join(cache_dir, "items.npy"), np.asarray(self.items))
+
+        # Written last: a cache without meta is never considered valid
+        with open(os.path.join(cache_dir, "meta.json"), "wb") as f:
+            f.write(orjson.dumps({"fingerprint": fingerprint, "shapes": shapes}))
+
+    def _load(self, cache_dir: str, meta: Dict) -> None:
+        def load_csr(name: str) -> sp.csr_matrix:
+            arrays = [
+                np.load(os.path.join(cache_dir, f"{name}_{part}.npy"), mmap_mode="r")
+                for part in ("data", "indices", "indptr")
+            ]
+            return sp.csr_matrix(tuple(arrays), shape=tuple(meta["shapes"][name]), copy=False)
+
+        self.mat = load_csr("mat")
+        self.item_mat_normalized = load_csr("item_mat")
+
+        self.users = np.load(os.path.join(cache_dir, "users.npy"))
+        self.items = np.load(os.path.join(cache_dir, "items.npy"))
+        self.user_idx = {int(u): i for i, u in enumerate(self.users)}
+        self.item_idx = {int(m): i for i, m in enumerate(self.items)}
+        self.items_arr = np.asarray(self.items, dtype=np.int64)
+        self._to_device()
+
+    def fit_or_load(self, ratings: pd.DataFrame, cache_dir: str) -> None:
+        """
+        Reuse a fit() persisted under cache_dir when the ratings fingerprint
+        matches; otherwise fit and persist.
+
+        Matrix buffers are memory-mapped on load, so pages are read on demand.
+        """
+        fingerprint = self._fingerprint(ratings)
+        meta_path = os.path.join(cache_dir, "meta.json")
+
+        if os.path.exists(meta_path):
+            with open(meta_path, "rb") as f:
+                meta = orjson.loads(f.read())
+            if meta.get("fingerprint") == fingerprint:
+                print("Loading cached CF model")
+                self._load(cache_dir, meta)
+                return
+
+        print("Fitting CF model")
+        self.fit(ratings)
+        self._save(cache_dir, fingerprint)
 
     def recommend(self, user_id: int, k: int = 50) -> pd.DataFrame:
         """
@@ -58,18 +172,39 @@ class SimpleCFRecommender:
 
         Always returns a valid DataFrame.
         """
-        if self.mat is None or self.sim is None:
+        if self.mat is None or self.item_mat_normalized is None:
             raise RuntimeError("CF model not fitted. Call fit() first.")
 
-        if user_id not in self.user_idx:
-            return pd.DataFrame(columns=["movieId", "cf_score"])
+        known = user_id in self.user_idx
+        with self._stats_lock:
+            self.stats["recommend_calls"] += 1
+            if not known:
+                self.stats["unknown_user"] += 1
 
-        user_vector = self.mat[self.user_idx[user_id]]
-        scores = self.sim @ user_vector
+        if not known:
+            return pd.DataFrame(columns=["movieId", "cf_score"])
 
-        top_indices = np.argsort(-scores)[:k]
+        # sim @ user_vector == N @ (N[user_items].sum(axis=0)).T, which only
+        # touches the rows of the items this user interacted with.
+        user_items = self.mat.getrow(self.user_idx[user_id]).indices
+        item_mat = self.item_mat_normalized
+        profile = np.asarray(item_mat[user_items].sum(axis=0)).ravel()
+
+        if self._item_t is not None:
+            scores_t = torch.mv(self._item_t, torch.from_numpy(profile).to(self.device))
+            top = torch.topk(scores_t, min(k, scores_t.shape[0]))
+            top_indices = top.indices.cpu().numpy()
+            top_scores = top.values.cpu().numpy()
+        else:
+            scores = item_mat @ profile
+
+            # Partial sort: O(n + k log k) instead of a full O(n log n) argsort.
+            k = min(k, len(scores))
+            idx = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+            top_indices = idx[np.argsort(-scores[idx])]
+            top_scores = scores[top_indices]
 
         return pd.DataFrame({
-            "movieId": [int(self.idx_item[i]) for i in top_indices],
-            "cf_score": scores[top_indices].astype(float)
+            "movieId": self.items_arr[top_indices],
+            "cf_score": top_scores.astype(float)
         })
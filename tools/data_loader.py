@@ -1,13 +1,23 @@
+import importlib.util
 import os
+import shutil
+import tempfile
 import zipfile
 import requests
-from io import BytesIO
-from typing import Tuple
+from typing import Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from config import POCConfig
 
 
+# Only the columns used downstream, at the narrowest dtypes that hold them
+RATINGS_DTYPES = {"userId": np.int32, "movieId": np.int32, "rating": np.float32}
+MOVIES_DTYPES = {"movieId": np.int32, "title": "string", "genres": "string"}
+
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") is not None else "c"
+
+
 class MovieLensLoader:
     """
     Responsible for loading the MovieLens dataset in a safe, repeatable way.
@@ -33,17 +43,96 @@ class MovieLensLoader:
     def _download_and_extract(self) -> None:
         """
         Download and extract the MovieLens dataset.
+
+        The archive is streamed to disk rather than buffered in memory. When
+        the server sends an ETag, the zip is kept next to an .etag sidecar so
+        later runs can revalidate with If-None-Match and skip the download.
         """
         print("MovieLens dataset not found. Downloading...")
 
-        response = requests.get(self.cfg.movielens_url, timeout=120)
-        response.raise_for_status()
+        os.makedirs("data", exist_ok=True)
+        zip_path = os.path.join("data", os.path.basename(self.cfg.movielens_url))
+        etag_path = zip_path + ".etag"
 
-        with zipfile.ZipFile(BytesIO(response.content)) as z:
-            z.extractall("data")
+        headers = {}
+        cached_etag = self._read_etag(etag_path) if os.path.exists(zip_path) else None
+        if cached_etag:
+            headers["If-None-Match"] = cached_etag
+
+        tmp_path = None
+        try:
+            with requests.get(self.cfg.movielens_url, headers=headers, stream=True, timeout=120) as response:
+                not_modified = response.status_code == 304
+                if not not_modified:
+                    response.raise_for_status()
+                    response.raw.decode_content = True
+
+                    with tempfile.NamedTemporaryFile(dir="data", suffix=".zip", delete=False) as tf:
+                        tmp_path = tf.name
+                        shutil.copyfileobj(response.raw, tf, length=1 << 20)
+                    etag = response.headers.get("ETag")
+
+            if not_modified:
+                if self._extract_cached(zip_path, etag_path):
+                    print("Cached MovieLens archive is up to date.")
+                    return
+                # The cache is gone now, so the retry downloads without If-None-Match
+                print("Cached MovieLens archive is corrupt. Downloading again...")
+                self._download_and_extract()
+                return
+
+            self._extract(tmp_path)
+        except BaseException:
+            # Never leave a partial archive behind (reset, timeout, Ctrl-C, bad zip)
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        if etag:
+            os.replace(tmp_path, zip_path)
+            with open(etag_path, "w", encoding="utf-8") as f:
+                f.write(etag)
+        else:
+            os.unlink(tmp_path)
 
         print("Download and extraction complete.")
 
+    @staticmethod
+    def _read_etag(etag_path: str) -> Optional[str]:
+        if not os.path.exists(etag_path):
+            return None
+        with open(etag_path, encoding="utf-8") as f:
+            return f.read().strip() or None
+
+    @classmethod
+    def _extract_cached(cls, zip_path: str, etag_path: str) -> bool:
+        """
+        Extract the kept archive; on a corrupt zip drop it and its .etag.
+        """
+        try:
+            cls._extract(zip_path)
+            return True
+        except zipfile.BadZipFile:
+            for path in (zip_path, etag_path):
+                if os.path.exists(path):
+                    os.unlink(path)
+            return False
+
+    @staticmethod
+    def _extract(zip_path: str) -> None:
+        with zipfile.ZipFile(zip_path) as z:
+            z.extractall("data")
+
+    @staticmethod
+    def _read_csv(path: str, dtypes: dict) -> pd.DataFrame:
+        """
+        Read only the known columns present in the header, so absent ones
+        are left to the required-column checks in load().
+        """
+        header = pd.read_csv(path, nrows=0).columns
+        present = {col: dtype for col, dtype in dtypes.items() if col in header}
+        return pd.read_csv(path, usecols=list(present), dtype=present, engine=CSV_ENGINE)
+
     def load(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Load ratings and movies DataFrames.
@@ -59,8 +148,8 @@ class MovieLensLoader:
         movies_path = os.path.join(self.cfg.data_dir, "movies.csv")
 
         try:
-            ratings = pd.read_csv(ratings_path)
-            movies = pd.read_csv(movies_path)
+            ratings = self._read_csv(ratings_path, RATINGS_DTYPES)
+            movies = self._read_csv(movies_path, MOVIES_DTYPES)
         except Exception as e:
             raise RuntimeError(
                 "Failed to load MovieLens CSV files. "
@@ -71,9 +160,13 @@ class MovieLensLoader:
         required_movie_cols = {"movieId", "title"}
 
         if not required_rating_cols.issubset(ratings.columns):
-            raise ValueError("ratings.csv is missing required columns")
+            raise ValueError(
+                f"ratings.csv is missing required columns: {sorted(required_rating_cols - set(ratings.columns))}"
+            )
 
         if not required_movie_cols.issubset(movies.columns):
-            raise ValueError("movies.csv is missing required columns")
+            raise ValueError(
+                f"movies.csv is missing required columns: {sorted(required_movie_cols - set(movies.columns))}"
+            )
 
         return ratings, movies
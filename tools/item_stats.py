@@ -1,5 +1,5 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, Any, Optional
 import numpy as np
 import pandas as pd
@@ -7,36 +7,64 @@ import pandas as pd
 
 @dataclass
 class ItemStats:
-    popularity_norm: Dict[int, float]
-    avg_rating_norm: Dict[int, float]
-    rating_count: Dict[int, int]
+    # Aligned arrays: row i describes movie_ids[i]
+    movie_ids: np.ndarray
+    popularity_norm: np.ndarray
+    avg_rating_norm: np.ndarray
+    rating_count: np.ndarray
+    _idx: Dict[int, int] = field(init=False, repr=False)
+    _index: pd.Index = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # movieId -> row: dict for scalar lookups, Index for vectorized ones
+        self._idx = dict(zip(self.movie_ids.tolist(), range(len(self.movie_ids))))
+        self._index = pd.Index(self.movie_ids)
 
     @staticmethod
     def build(ratings: pd.DataFrame) -> "ItemStats":
-        # counts
-        counts = ratings.groupby("movieId")["rating"].count().astype(int)
+        # counts + avg rating in a single grouped pass
+        g = ratings.groupby("movieId", sort=False)["rating"].agg(["count", "mean"])
+
+        counts = g["count"].to_numpy(np.int64)
         max_c = int(counts.max()) if len(counts) else 1
-        popularity_norm = {int(mid): float(c / max_c) for mid, c in counts.items()}
+        popularity_norm = counts.astype(np.float32) / np.float32(max_c)
 
-        # avg rating
-        avgs = ratings.groupby("movieId")["rating"].mean()
         # Normalize ratings from [0.5..5] -> [0..1] (MovieLens uses 0.5 increments)
-        avg_rating_norm = {int(mid): float((r - 0.5) / (5.0 - 0.5)) for mid, r in avgs.items()}
+        avg_rating_norm = (g["mean"].to_numpy(np.float32) - 0.5) / (5.0 - 0.5)
 
-        rating_count = {int(mid): int(c) for mid, c in counts.items()}
-        return ItemStats(popularity_norm=popularity_norm, avg_rating_norm=avg_rating_norm, rating_count=rating_count)
+        return ItemStats(
+            movie_ids=g.index.to_numpy(np.int64),
+            popularity_norm=popularity_norm,
+            avg_rating_norm=avg_rating_norm.astype(np.float32),
+            rating_count=counts,
+        )
+
+    def _row(self, movie_id: int) -> Optional[int]:
+        return self._idx.get(int(movie_id))
 
     def get_popularity(self, movie_id: int) -> float:
-        return float(self.popularity_norm.get(int(movie_id), 0.0))
+        i = self._row(movie_id)
+        return float(self.popularity_norm[i]) if i is not None else 0.0
+
+    def popularity_for(self, movie_ids: np.ndarray) -> np.ndarray:
+        """
+        Vectorized get_popularity (0.0 for unknown movies).
+        """
+        rows = self._index.get_indexer(np.asarray(movie_ids, dtype=np.int64))
+        if not len(self.popularity_norm):
+            return np.zeros(len(rows), dtype=np.float32)
+        return np.where(rows >= 0, self.popularity_norm[np.clip(rows, 0, None)], np.float32(0.0))
 
     def get_avg_rating(self, movie_id: int) -> float:
-        return float(self.avg_rating_norm.get(int(movie_id), 0.5))
+        i = self._row(movie_id)
+        return float(self.avg_rating_norm[i]) if i is not None else 0.5
 
     def as_debug_dict(self, movie_id: int) -> Dict[str, Any]:
         mid = int(movie_id)
+        i = self._row(mid)
         return {
             "movieId": mid,
             "popularity_norm": self.get_popularity(mid),
             "avg_rating_norm": self.get_avg_rating(mid),
-            "rating_count": int(self.rating_count.get(mid, 0)),
+            "rating_count": int(self.rating_count[i]) if i is not None else 0,
         }
@@ -0,0 +1,51 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class MovieCatalog:
+    # Aligned arrays: row i describes movie_ids[i]
+    movie_ids: np.ndarray
+    titles: np.ndarray
+    genres: np.ndarray
+    _index: pd.Index = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._index = pd.Index(self.movie_ids)
+
+    @staticmethod
+    def from_movies(movies: pd.DataFrame) -> "MovieCatalog":
+        return MovieCatalog(
+            movie_ids=movies["movieId"].to_numpy(np.int64),
+            titles=movies["title"].fillna("Unknown").to_numpy(dtype=object),
+            genres=movies["genres"].fillna("").to_numpy(dtype=object),
+        )
+
+    @staticmethod
+    def from_map(movie_map: Dict[int, Dict[str, str]]) -> "MovieCatalog":
+        """
+        Build from the legacy {movieId: {"title", "genres"}} mapping.
+        """
+        metas = list(movie_map.values())
+        return MovieCatalog(
+            movie_ids=np.fromiter(movie_map.keys(), dtype=np.int64, count=len(metas)),
+            titles=np.array([m.get("title", "Unknown") for m in metas], dtype=object),
+            genres=np.array([m.get("genres", "") for m in metas], dtype=object),
+        )
+
+    def lookup(self, movie_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized (titles, genres) for movie_ids ("Unknown" / "" if missing).
+        """
+        rows = self._index.get_indexer(np.asarray(movie_ids, dtype=np.int64))
+        known = rows >= 0
+        safe = np.where(known, rows, 0)
+        if not len(self.movie_ids):
+            return np.full(len(rows), "Unknown", dtype=object), np.full(len(rows), "", dtype=object)
+        return (
+            np.where(known, self.titles[safe], "Unknown"),
+            np.where(known, self.genres[safe], ""),
+        )
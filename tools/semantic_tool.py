@@ -1,4 +1,6 @@
-import os, json
+import os, json, threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import hnswlib
 from openai import OpenAI
@@ -9,6 +11,13 @@ class SemanticSearchTool:
         self.cfg = cfg
         self.client = OpenAI()
         self.index = None
+        self._movie_ids_arr = None
+
+        # LRU of normalized query vectors keyed by (model_id, query)
+        self._query_cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        # embed_cache_hits / embed_cache_misses, guarded by _query_cache_lock
+        self.stats: Counter = Counter()
 
     def _embed(self, texts):
         r = self.client.embeddings.create(
@@ -22,27 +31,163 @@ class SemanticSearchTool:
     def build_or_load(self, movies):
         os.makedirs("embeddings", exist_ok=True)
 
-        if os.path.exists(self.cfg.embedding_path):
+        from_cache = os.path.exists(self.cfg.embedding_path)
+        if from_cache:
             print("Loading cached embeddings")
-            X = np.load(self.cfg.embedding_path)
+            # Demand-paged; untouched when the saved HNSW index is reused
+            X = np.load(self.cfg.embedding_path, mmap_mode="r")
             self.movie_ids = json.load(open(self.cfg.embedding_ids_path))
         else:
             print("Building embeddings (one-time)")
-            texts = (movies.title + " | " + movies.genres).fillna("").tolist()
-            X = np.vstack([self._embed(texts[i:i+100]) for i in range(0, len(texts), 100)])
-            np.save(self.cfg.embedding_path, X)
+            # Plain str joins over the raw values; avoids object-dtype Series arithmetic
+            titles = movies["title"].fillna("").to_numpy(dtype=object)
+            genres = movies["genres"].fillna("").to_numpy(dtype=object)
+            texts = [f"{t} | {g}" for t, g in zip(titles, genres)]
+            batches = [texts[i:i+100] for i in range(0, len(texts), 100)]
+            # I/O-bound: fan the requests out; map() keeps batch order
+            with ThreadPoolExecutor(max_workers=self.cfg.embedding_max_workers) as ex:
+                X = np.vstack(list(ex.map(self._embed, batches)))
+            np.save(self.cfg.embedding_path, X.astype(np.float32, copy=False))
             self.movie_ids = movies.movieId.astype(int).tolist()
             json.dump(self.movie_ids, open(self.cfg.embedding_ids_path, "w"))
+        self._movie_ids_arr = np.asarray(self.movie_ids, dtype=np.int64)
+
+        # Freshly built embeddings always get a fresh graph
+        if self.cfg.semantic_index_quantization == "none":
+            index_path = self.cfg.embedding_path + ".hnsw"
+            if not (from_cache and self._load_index(index_path, X)):
+                self._build_index(X)
+                self.index.save_index(index_path)
+            self.index.set_ef(64)
+        else:
+            index_path = f"{self.cfg.embedding_path}.{self.cfg.semantic_index_quantization}.faiss"
+            if not (from_cache and self._load_faiss_index(index_path, X)):
+                self._build_faiss_index(X)
+                self._faiss().write_index(self.index, index_path)
+            self.index.hnsw.efSearch = 64
+
+    def _load_index(self, path, X):
+        if not os.path.exists(path):
+            return False
+        print("Loading cached HNSW index")
+        index = hnswlib.Index(space="cosine", dim=X.shape[1])
+        index.load_index(path, max_elements=len(X))
+        if index.get_current_count() != len(X):
+            print("Cached HNSW index is stale; rebuilding")
+            return False
+        self.index = index
+        return True
 
+    def _build_index(self, X):
         self.index = hnswlib.Index(space="cosine", dim=X.shape[1])
         self.index.init_index(len(X), ef_construction=200, M=16)
+        # hnswlib copies the vectors, so a memory-mapped X is only paged in here
         self.index.add_items(X, np.arange(len(X)))
-        self.index.set_ef(64)
+
+    @staticmethod
+    def _faiss():
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError(
+                "semantic_index_quantization requires faiss "
+                "(pip install faiss-cpu), or set it to 'none'"
+            ) from e
+        return faiss
+
+    def _load_faiss_index(self, path, X):
+        if not os.path.exists(path):
+            return False
+        print("Loading cached FAISS index")
+        index = self._faiss().read_index(path)
+        if index.ntotal != len(X):
+            print("Cached FAISS index is stale; rebuilding")
+            return False
+        self.index = index
+        return True
+
+    def _build_faiss_index(self, X):
+        """
+        HNSW over scalar-quantized vectors (int8 or fp16 codes): a quarter /
+        half of the float32 bytes touched per distance. Vectors are unit
+        norm, so inner product ranks like cosine.
+        """
+        faiss = self._faiss()
+        qtype = {
+            "int8": faiss.ScalarQuantizer.QT_8bit,
+            "fp16": faiss.ScalarQuantizer.QT_fp16,
+        }[self.cfg.semantic_index_quantization]
+
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        self.index = faiss.IndexHNSWSQ(X.shape[1], qtype, 16, faiss.METRIC_INNER_PRODUCT)
+        self.index.hnsw.efConstruction = 200
+        self.index.train(X)
+        self.index.add(X)
+
+    def _knn(self, qv, k):
+        """
+        (labels, cosine similarities) for a batch of unit query vectors.
+        """
+        if self.cfg.semantic_index_quantization == "none":
+            labels, dist = self.index.knn_query(qv, k=k)
+            return labels, 1.0 - dist
+        sims, labels = self.index.search(np.ascontiguousarray(qv, dtype=np.float32), k)
+        return labels, sims
+
+    def _embed_queries(self, queries):
+        """
+        (len(queries), dim) unit vectors; only LRU misses are embedded, in
+        a single request.
+        """
+        model = self.cfg.embedding_model_id
+        vecs = [None] * len(queries)
+        missing = {}
+        with self._query_cache_lock:
+            for j, query in enumerate(queries):
+                qv = self._query_cache.get((model, query))
+                if qv is not None:
+                    self._query_cache.move_to_end((model, query))
+                    self.stats["embed_cache_hits"] += 1
+                    vecs[j] = qv
+                else:
+                    missing.setdefault(query, []).append(j)
+            self.stats["embed_cache_misses"] += len(missing)
+
+        if missing:
+            texts = list(missing)
+            X = self._embed(texts)
+            with self._query_cache_lock:
+                for query, row in zip(texts, X):
+                    qv = np.array(row, dtype=np.float32)
+                    qv.flags.writeable = False
+                    self._query_cache[(model, query)] = qv
+                    self._query_cache.move_to_end((model, query))
+                    for j in missing[query]:
+                        vecs[j] = qv
+                while len(self._query_cache) > self.cfg.query_embedding_cache_size:
+                    self._query_cache.popitem(last=False)
+
+        return np.vstack(vecs)
+
+    def search_batch(self, queries, k):
+        """
+        One result per query, as {"movieId": int64, "semantic_score": float32}
+        arrays: one embeddings call for the uncached queries and one batched
+        knn query.
+        """
+        if not queries:
+            return []
+        labels, sims = self._knn(self._embed_queries(queries), k)
+        movie_ids = self._movie_ids_arr
+        out = []
+        for row_labels, row_sims in zip(labels, sims):
+            # FAISS pads short result rows with -1
+            found = row_labels >= 0
+            out.append({
+                "movieId": movie_ids[row_labels[found]],
+                "semantic_score": np.asarray(row_sims[found], dtype=np.float32),
+            })
+        return out
 
     def search(self, query, k):
-        qv = self._embed([query])
-        labels, dist = self.index.knn_query(qv, k=k)
-        return [
-            {"movieId": self.movie_ids[i], "semantic_score": 1.0 - d}
-            for i, d in zip(labels[0], dist[0])
-        ]
+        return self.search_batch([query], k)[0]